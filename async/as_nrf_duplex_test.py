@@ -0,0 +1,91 @@
+# as_nrf_duplex_test.py Benchmark of Duplex against Master/Slave
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# Both nodes run on one target using simulated radios: no hardware is needed.
+# For each protocol the round trip time of short messages is measured, then
+# the throughput with data flowing in both directions at once.
+
+import sim_nrf
+sim_nrf.install()  # Must precede import of as_nrf_stream
+import uasyncio as asyncio
+from time import ticks_ms, ticks_diff
+from as_nrf_stream import Master, Slave, DuplexMaster, DuplexSlave
+from asconfig import RadioSetup
+
+async def echo(device):  # Return lines to sender
+    sreader = asyncio.StreamReader(device)
+    swriter = asyncio.StreamWriter(device, {})
+    while True:
+        res = await sreader.readline()
+        if res:
+            swriter.write(res)
+            await swriter.drain()
+
+async def rtt(device, n):  # Mean round trip time of n short messages
+    sreader = asyncio.StreamReader(device)
+    swriter = asyncio.StreamWriter(device, {})
+    t = ticks_ms()
+    for x in range(n):
+        swriter.write('{}\n'.format(x).encode())
+        await swriter.drain()
+        res = b''
+        while not res:
+            res = await sreader.readline()
+    return ticks_diff(ticks_ms(), t) // n
+
+async def sender(device, nlines, linelen):
+    swriter = asyncio.StreamWriter(device, {})
+    pad = 'x' * (linelen - 6)
+    for n in range(nlines):
+        swriter.write('{:05d}{}\n'.format(n, pad).encode())
+        await swriter.drain()
+
+async def receiver(device, nlines):
+    sreader = asyncio.StreamReader(device)
+    n = 0
+    while n < nlines:
+        res = await sreader.readline()
+        if res:
+            if int(res[:5]) != n:
+                print('Sequence error', res)
+            n += 1
+
+async def main(duplex, loss, nlines, linelen):
+    sim_nrf.ether.reset()
+    sim_nrf.ether.loss = loss
+    cfg = RadioSetup(None, None, None, True)
+    if duplex:
+        master, slave = DuplexMaster(cfg), DuplexSlave(cfg)
+    else:
+        master, slave = Master(cfg), Slave(cfg)
+    task = asyncio.create_task(echo(slave))
+    await asyncio.sleep(1)
+    t_rtt = await rtt(master, 20)
+    task.cancel()
+    await asyncio.sleep(1)  # Ensure slave queues are empty
+    t = ticks_ms()
+    asyncio.create_task(sender(master, nlines, linelen))
+    asyncio.create_task(sender(slave, nlines, linelen))
+    rx = asyncio.create_task(receiver(slave, nlines))
+    await receiver(master, nlines)
+    await rx
+    dt = ticks_diff(ticks_ms(), t)
+    rate = 2 * nlines * linelen * 1000 // dt
+    print('{:8s}{:6d}ms{:7d}ms{:8d} bytes/s'.format('Duplex' if duplex else 'Single', t_rtt, dt, rate))
+
+def test(loss=0, nlines=50, linelen=100):
+    print('Protocol     RTT   Transfer  Throughput')
+    for duplex in (False, True):
+        try:
+            asyncio.run(main(duplex, loss, nlines, linelen))
+        finally:  # Reset uasyncio case of KeyboardInterrupt
+            asyncio.new_event_loop()
+
+msg = '''Benchmark of Duplex and single radio protocols using simulated radios.
+Issue
+as_nrf_duplex_test.test()
+Optional args: loss=0, nlines=50, linelen=100
+'''
+print(msg)
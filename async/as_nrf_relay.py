@@ -0,0 +1,146 @@
+# as_nrf_relay.py Multi-hop routing over as_nrf_stream links
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# A Router owns one or more links, each being a Master, Slave or Duplex
+# instance. Messages are framed with a 7 byte header: sync byte, destination
+# node, source node, hop count, payload length and header check byte. The
+# payload is followed by its check byte. Messages for other nodes are
+# forwarded on the link given by the routing table. Reliability is provided by
+# each link: packets are retransmitted on every hop until acknowledged and
+# duplicates are discarded by PID.
+# Each link has a reader task, which reads continuously, and a writer task
+# which sends frames from a bounded queue. While a queue is full, frames for it
+# are held unparsed in the buffer of the link they arrived on.
+# When a peer power cycles the link discards any partial data, so a frame may
+# be truncated. The reader then finds a bad header and scans for the next sync
+# byte. A payload made up from two frames fails its check and is dropped.
+
+import uasyncio as asyncio
+import ustruct
+from micropython import const
+
+_HDR = '<BBBBHB'  # Sync, destination, source, hop count, payload length, check
+_HDRLEN = const(7)
+_SYNC = const(0xa5)
+MAXHOPS = const(8)  # Messages which have been forwarded this often are dropped
+MAXLEN = const(1024)  # Maximum payload length
+TXQLEN = const(4)  # Maximum no. of frames queued for each link
+
+def _check(buf):  # Check byte
+    return sum(buf) & 0xff
+
+class Router:
+    # node: ID of this node (0-255). links: list of stream devices. routes:
+    # optional dict of static routes, destination: link index. If learn is
+    # True the link on which a node's messages arrive becomes its route.
+    # Messages to a node with no route are sent on link default.
+    def __init__(self, node, links, routes=None, learn=True, default=0):
+        self._node = node
+        self._links = links
+        self._routes = {} if routes is None else dict(routes)
+        self._static = set(self._routes)
+        self._learn = learn
+        self._default = default
+        self._bufs = [b''] * len(links)  # Unparsed data from each link
+        self._txqs = [[] for _ in links]  # Frames awaiting transmission
+        self._txevts = [asyncio.Event() for _ in links]  # Frame queued
+        self._room = asyncio.Event()  # A frame has left a queue
+        self._rxq = []  # (source, data) for this node
+        self._evt = asyncio.Event()
+        self._stats = [0, 0]  # Forwarded, dropped
+        for idx in range(len(links)):
+            asyncio.create_task(self._reader(idx))
+            asyncio.create_task(self._writer(idx))
+
+    # Links are read continuously: a Master or Slave only services its link
+    # while it is being read, so a reader must never wait on another link.
+    async def _reader(self, idx):
+        sreader = asyncio.StreamReader(self._links[idx])
+        while True:
+            data = await sreader.read(_HDRLEN + MAXLEN + 1)
+            self._bufs[idx] += data
+            self._parse(idx)
+
+    # Process complete frames received on link idx. On a bad header discard
+    # data up to the next sync byte. Stop at a frame whose outgoing queue is
+    # full: it is retried when a writer makes room.
+    def _parse(self, idx):
+        buf = self._bufs[idx]
+        while len(buf) >= _HDRLEN:
+            sync, dst, src, hops, n, chk = ustruct.unpack(_HDR, buf[:_HDRLEN])
+            if sync != _SYNC or chk != _check(buf[:_HDRLEN - 1]) or n > MAXLEN:
+                i = buf.find(bytes((_SYNC,)), 1)
+                buf = buf[i:] if i > 0 else b''
+                continue
+            end = _HDRLEN + n
+            if len(buf) <= end:  # Incomplete frame
+                break
+            data = buf[_HDRLEN:end]
+            if buf[end] != _check(data):  # Frame was truncated: rescan its data
+                self._stats[1] += 1
+                buf = buf[_HDRLEN:]
+                continue
+            if self._learn and src not in self._static:
+                self._routes[src] = idx
+            if dst == self._node:
+                self._rxq.append((src, data))
+                self._evt.set()
+            elif hops >= MAXHOPS:
+                self._stats[1] += 1
+            elif not self._queue(dst, src, hops + 1, data, idx):
+                break
+            buf = buf[end + 1:]
+        self._bufs[idx] = buf
+
+    # Queue a frame on the route to dst. Never send a message back on the link
+    # it arrived on (rxidx). Return False if the queue is full.
+    def _queue(self, dst, src, hops, data, rxidx=None):
+        idx = self._routes.get(dst, self._default)
+        if idx is None or idx == rxidx:
+            self._stats[1] += 1
+            return True
+        q = self._txqs[idx]
+        if len(q) >= TXQLEN:
+            return False
+        hdr = ustruct.pack(_HDR[:-1], _SYNC, dst, src, hops, len(data))
+        q.append(b''.join((hdr, bytes((_check(hdr),)), data, bytes((_check(data),)))))
+        self._txevts[idx].set()
+        if rxidx is not None:
+            self._stats[0] += 1
+        return True
+
+    async def _writer(self, idx):
+        swriter = asyncio.StreamWriter(self._links[idx], {})
+        q = self._txqs[idx]
+        evt = self._txevts[idx]
+        while True:
+            while not q:
+                evt.clear()
+                await evt.wait()
+            swriter.write(q.pop(0))
+            self._room.set()
+            for i in range(len(self._links)):  # Resume readers stalled on a full queue
+                self._parse(i)
+            await swriter.drain()
+
+    # **** API ****
+    async def send(self, dst, data):  # Send bytes to node dst
+        if len(data) > MAXLEN:
+            raise ValueError('Message too long')
+        while not self._queue(dst, self._node, 0, data):
+            self._room.clear()
+            await self._room.wait()
+
+    async def recv(self):  # Return (source, data) of next message for this node
+        while not self._rxq:
+            self._evt.clear()
+            await self._evt.wait()
+        return self._rxq.pop(0)
+
+    def routes(self):  # Routing table: destination node: link index
+        return self._routes
+
+    def stats(self):  # Messages forwarded, messages dropped
+        return self._stats
@@ -0,0 +1,110 @@
+# as_nrf_relay_test.py Benchmark of multi-hop routing
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# All nodes run on one target using simulated radios: no hardware is needed.
+# A chain is built of a gateway (node 0), relays, and an end node. Link k is
+# on channel 80 + k. Each relay is Slave on its upstream link and Master on
+# its downstream link. The end node announces itself so that routes are
+# learned, then the gateway measures latency and throughput to it. test2
+# sends messages in both directions at once.
+
+import sim_nrf
+sim_nrf.install()  # Must precede import of as_nrf_stream
+import uasyncio as asyncio
+import gc
+import ustruct
+from time import ticks_ms, ticks_diff
+from as_nrf_stream import Master, Slave
+from as_nrf_relay import Router
+from asconfig import RadioSetup
+
+def link(k):  # Create the two ends of link k
+    cfg = RadioSetup(None, None, None, True)
+    cfg.channel = 80 + k
+    return Master(cfg), Slave(cfg)
+
+# Build a chain of hops links. Return the gateway, end node and relay RAM.
+async def chain(hops, loss):
+    sim_nrf.ether.reset()
+    sim_nrf.ether.loss = loss
+    m, s = link(0)
+    gateway = Router(0, [m])
+    ram = 0
+    for k in range(1, hops):  # Relays: upstream link 0, downstream link 1
+        m, up = link(k)
+        gc.collect()
+        free = gc.mem_free()
+        Router(k, [s, m])
+        gc.collect()
+        ram = free - gc.mem_free()  # Router only: excludes links and radios
+        s = up
+    end = Router(hops, [s])
+    await end.send(0, b'hello')  # Gateway and relays learn route
+    await gateway.recv()
+    return gateway, end, ram
+
+async def main(hops, loss, nmsgs, msglen):
+    gateway, end, ram = await chain(hops, loss)
+    lat = 0
+    for n in range(nmsgs):  # Latency
+        await gateway.send(hops, ustruct.pack('<I', ticks_ms()))
+        _, data = await end.recv()
+        lat += ticks_diff(ticks_ms(), ustruct.unpack('<I', data)[0])
+    pad = bytes(msglen)
+    t = ticks_ms()
+    for n in range(nmsgs):  # Throughput
+        await gateway.send(hops, pad)
+    for n in range(nmsgs):
+        await end.recv()
+    dt = ticks_diff(ticks_ms(), t)
+    print('{:4d}{:10d}ms{:10d} bytes/s{:10d} bytes'.format(hops, lat // nmsgs, nmsgs * msglen * 1000 // dt, ram))
+
+def test(maxhops=3, loss=0, nmsgs=10, msglen=100):
+    print('Hops   Latency   Throughput   Relay RAM')
+    for hops in range(1, maxhops + 1):
+        try:
+            asyncio.run(main(hops, loss, nmsgs, msglen))
+        finally:  # Reset uasyncio case of KeyboardInterrupt
+            asyncio.new_event_loop()
+
+# Two-way traffic: relays forward in both directions at once.
+async def sender(router, dst, nmsgs, msglen):
+    for n in range(nmsgs):
+        await router.send(dst, ustruct.pack('<I', n) + bytes(msglen - 4))
+
+async def receiver(router, nmsgs, name):
+    for n in range(nmsgs):
+        _, data = await router.recv()
+        if ustruct.unpack('<I', data[:4])[0] != n:
+            print(name, 'sequence error')
+
+async def main2(hops, loss, nmsgs, msglen, secs):
+    gateway, end, _ = await chain(hops, loss)
+    asyncio.create_task(sender(gateway, hops, nmsgs, msglen))
+    asyncio.create_task(sender(end, 0, nmsgs, msglen))
+    t = ticks_ms()
+    try:
+        await asyncio.wait_for(asyncio.gather(receiver(end, nmsgs, 'End node'),
+                                              receiver(gateway, nmsgs, 'Gateway')), secs)
+    except asyncio.TimeoutError:
+        print('Stalled after {}s'.format(secs))
+    else:
+        dt = ticks_diff(ticks_ms(), t)
+        print('{} messages each way in {}ms: {} bytes/s'.format(nmsgs, dt, 2 * nmsgs * msglen * 1000 // dt))
+
+def test2(hops=2, loss=0.3, nmsgs=20, msglen=200, secs=60):
+    try:
+        asyncio.run(main2(hops, loss, nmsgs, msglen, secs))
+    finally:
+        asyncio.new_event_loop()
+
+msg = '''Benchmark of multi-hop routing using simulated radios.
+Issue
+as_nrf_relay_test.test()
+Optional args: maxhops=3, loss=0, nmsgs=10, msglen=100
+as_nrf_relay_test.test2() Traffic in both directions through a relay.
+Optional args: hops=2, loss=0.3, nmsgs=20, msglen=200, secs=60
+'''
+print(msg)
@@ -0,0 +1,120 @@
+# as_nrf_spool.py Flash backed transmit spool for as_nrf_stream
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# Outgoing data is appended to <path>.dat and read back in bulk. Delivery is
+# tracked by appending state records to <path>.log. A record holds the offset
+# of the first undelivered byte plus the length and PID of the packet in
+# flight. After a power cycle the driver resends that packet with its original
+# PID so the peer discards it if it had already been received. When all data
+# has been delivered both files are deleted.
+
+import os
+import ustruct
+from micropython import const
+
+_FMT = '<IBB'  # Offset, length of packet in flight, PID
+_RECSIZE = const(6)
+_LOGMAX = const(4096)  # Compact the log when it reaches this size
+
+class Spool:
+    def __init__(self, path, ram=512, chunk=480):
+        self.ram = ram  # Spool when the RAM queue would exceed this size
+        self._chunk = chunk  # Size of bulk reads
+        self._dat = path + '.dat'
+        self._log = path + '.log'
+        self._rec = bytearray(_RECSIZE)
+        self._ack = 0  # Offset of first undelivered byte
+        self._inflight = 0  # Length of packet in flight
+        self._pid = 0
+        self._nlog = 0  # Log file size
+        try:
+            with open(self._log, 'rb') as f:
+                self._nlog = f.seek(0, 2)
+                n = self._nlog // _RECSIZE  # Ignore any incomplete record
+                if n:
+                    f.seek((n - 1) * _RECSIZE)
+                    self._ack, self._inflight, self._pid = ustruct.unpack(_FMT, f.read(_RECSIZE))
+        except OSError:  # No log: spool is empty
+            pass
+        try:
+            self._f = open(self._dat, 'r+b')
+        except OSError:
+            self._f = open(self._dat, 'w+b')
+        self._size = self._f.seek(0, 2)
+        if self._ack + self._inflight > self._size:  # Data file lost
+            self._ack = self._inflight = 0
+        self._rd = self._ack + self._inflight  # Offset of next byte to read
+        self._logf = open(self._log, 'ab')
+        if self._nlog % _RECSIZE:  # Torn write: realign the log before appending
+            ustruct.pack_into(_FMT, self._rec, 0, self._ack, self._inflight, self._pid)
+            self._compact()
+
+    def __bool__(self):  # True if there is data not yet read
+        return self._rd < self._size
+
+    def __len__(self):  # No. of bytes not yet delivered
+        return self._size - self._ack
+
+    def write(self, buf):  # Append data. Can raise OSError if storage is full.
+        self._f.seek(self._size)
+        self._f.write(buf)
+        self._f.flush()
+        self._size += len(buf)
+
+    def read(self):  # Bulk read of up to one chunk of data
+        n = min(self._chunk, self._size - self._rd)
+        if n <= 0:
+            return b''
+        self._f.seek(self._rd)
+        d = self._f.read(n)
+        self._rd += len(d)
+        return d
+
+    # Return (data, pid) of packet in flight at power down or None
+    def resume(self):
+        if not self._inflight:
+            return None
+        self._f.seek(self._ack)
+        return self._f.read(self._inflight), self._pid
+
+    # Record delivery of n spooled bytes. m is the length of the next packet
+    # if it was read from the spool, else 0.
+    def commit(self, n, m, pid):
+        if not (n or m):
+            return
+        self._ack += n
+        self._inflight = m
+        self._pid = pid
+        if not m and self._ack >= self._size:
+            self._reset()  # All delivered: reclaim space
+            return
+        ustruct.pack_into(_FMT, self._rec, 0, self._ack, m, pid)
+        self._logf.write(self._rec)
+        self._logf.flush()
+        self._nlog += _RECSIZE
+        if self._nlog >= _LOGMAX:
+            self._compact()
+
+    # Replace the log with its last record. Rename ensures that a power outage
+    # leaves a valid log.
+    def _compact(self):
+        self._logf.close()
+        tmp = self._log + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(self._rec)
+        os.rename(tmp, self._log)
+        self._logf = open(self._log, 'ab')
+        self._nlog = _RECSIZE
+
+    # Delete data before the log: a surviving log with no data is discarded
+    # on power up.
+    def _reset(self):
+        self._f.close()
+        self._logf.close()
+        os.remove(self._dat)
+        os.remove(self._log)
+        self._f = open(self._dat, 'w+b')
+        self._logf = open(self._log, 'ab')
+        self._ack = self._inflight = self._rd = self._size = self._nlog = 0
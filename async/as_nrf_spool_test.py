@@ -0,0 +1,79 @@
+# as_nrf_spool_test.py Benchmark of draining a transmit spool after an outage
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# Both nodes run on one target using simulated radios: no hardware is needed.
+# Master queues data during a simulated outage. When the link is restored the
+# time taken to deliver the backlog to Slave is measured.
+
+import sim_nrf
+sim_nrf.install()  # Must precede import of as_nrf_stream
+import uasyncio as asyncio
+import os
+from time import ticks_ms, ticks_diff
+from as_nrf_stream import Master, Slave
+from asconfig import RadioSetup
+
+SPOOL = 'spool'
+
+def remove():  # Start with an empty spool
+    for ext in ('.dat', '.log'):
+        try:
+            os.remove(SPOOL + ext)
+        except OSError:
+            pass
+
+async def receiver(device, nlines, done):
+    sreader = asyncio.StreamReader(device)
+    n = 0
+    while n < nlines:
+        res = await sreader.readline()
+        if res:
+            if int(res[:5]) != n:
+                print('Sequence error', res)
+            n += 1
+    done.set()
+
+async def sink(device):  # Master must read to process incoming packets
+    sreader = asyncio.StreamReader(device)
+    while True:
+        await sreader.readline()
+
+async def main(nlines, linelen, ram, loss):
+    remove()
+    sim_nrf.ether.loss = loss  # Probability of losing a packet
+    sim_nrf.ether.up = False  # Outage
+    master = Master(RadioSetup(None, None, None, True, SPOOL, ram))
+    slave = Slave(RadioSetup(None, None, None, True))
+    done = asyncio.Event()
+    asyncio.create_task(receiver(slave, nlines, done))
+    asyncio.create_task(sink(master))
+    swriter = asyncio.StreamWriter(master, {})
+    pad = 'x' * (linelen - 6)
+    t = ticks_ms()
+    for n in range(nlines):
+        swriter.write('{:05d}{}\n'.format(n, pad).encode())
+        await swriter.drain()  # Does not block during outage
+    dt = ticks_diff(ticks_ms(), t)
+    print('Queued {} bytes in {}ms during outage.'.format(nlines * linelen, dt))
+    await asyncio.sleep(1)
+    sim_nrf.ether.up = True
+    t = ticks_ms()
+    await done.wait()
+    dt = ticks_diff(ticks_ms(), t)
+    print('Backlog delivered in {}ms: {} bytes/s.'.format(dt, nlines * linelen * 1000 // dt))
+    print('Master stats', master.stats(), 'Slave stats', slave.stats())
+
+def test(nlines=200, linelen=100, ram=512, loss=0):
+    try:
+        asyncio.run(main(nlines, linelen, ram, loss))
+    finally:  # Reset uasyncio case of KeyboardInterrupt
+        asyncio.new_event_loop()
+
+msg = '''Benchmark for as_nrf_stream transmit spool using simulated radios.
+Issue
+as_nrf_spool_test.test()
+Optional args: nlines=200, linelen=100, ram=512, loss=0
+'''
+print(msg)
@@ -25,8 +25,16 @@ PWR = const(0x40)  # Node has powered up: peer clears rxq.
 PID = const(0x80)  # 1-bit PID.
 CMDMASK = const(0x0f)  # LS bits is cmd
 
+# Duplex command bits: these replace MSG and ACK
+DACK = const(1)  # Packet acknowledges peer data with PID given by DPID
+DPID = const(2)
+SYN = const(4)  # Node has powered up: requests peer's acknowledge state
+SYNACK = const(8)  # Response to SYN. Acknowledge state is current.
+
 # Timing
-SEND_DELAY = const(10)  # Transmit delay (give remote time to turn round)
+SEND_DELAY = const(10)  # Default transmit delay (give remote time to turn round)
+DUPLEX_RETRY = const(5)  # Duplex: retransmit unacknowledged data (ms)
+DUPLEX_IDLE = const(50)  # Duplex: interval between keepalive packets (ms)
 
 # Optional statistics
 S_RX_TIMEOUTS = 0
@@ -57,20 +65,30 @@ class TxPacket(Packet):
         return self._buf
 
     # Update the buffer with data from the tx queue. Return the new reduced
-    # queue instance.
-    def update(self, txq):
-        txd = txq[:30]  # Get current data for tx up to interface maximum
+    # queue instance. n < 30 limits the payload of a traced packet.
+    def update(self, txq, n=30):
+        txd = txq[:n]  # Get current data for tx up to interface maximum
         self._len = len(txd)
         if self:  # Has payload
             self._pid ^= PID
         ustruct.pack_into(self._fmt, self._buf, 0, 0, self._len, txd)
         if self._ploads < 2:
             self._ploads += 1  # Payloads sent.
-        return txq[30:]
+        return txq[n:]
+
+    # Rebuild a spooled packet which was in flight at power down. Suppress
+    # the PWR bit: the stream continues where it left off.
+    def resume(self, data, pid):
+        self._pid = pid ^ PID  # .update toggles it back
+        self.update(data)
+        self._ploads = 2
 
     def __bool__(self):  # True if packet has payload
         return self._len > 0
 
+    def __len__(self):
+        return self._len
+
 class RxPacket(Packet):
     def __init__(self):
         super().__init__()
@@ -90,12 +108,11 @@ class RxPacket(Packet):
                 dupe = True
         return d[:nbytes], cmd, dupe, pwr
 
-# Base class for Master and Slave
+# Base class for Master, Slave and Duplex
 class AS_NRF24L01(io.IOBase):
     pipes = (b'\xf0\xf0\xf0\xf7\xe1', b'\xf0\xf0\xf0\xf7\xd2')
 
-    def __init__(self, config):
-        master = int(isinstance(self, Master))
+    def __init__(self, config, master):
         # Support gathering statistics. Delay until protocol running.
         self._is_running = False
         if config.stats:
@@ -106,6 +123,7 @@ class AS_NRF24L01(io.IOBase):
             self._do_stats = lambda _ : None
 
         self._tx_ms = config.tx_ms  # Max time master or slave can transmit
+        self._send_delay = getattr(config, 'send_delay', SEND_DELAY)
         radio = NRF24L01(config.spi, config.csn, config.ce, config.channel, 32)
         radio.open_tx_pipe(self.pipes[master ^ 1])
         radio.open_rx_pipe(1, self.pipes[master])
@@ -114,6 +132,23 @@ class AS_NRF24L01(io.IOBase):
         self._rxq = b''
         self._txpkt = TxPacket()
         self._rxpkt = RxPacket()
+        self._txsp = False  # Current packet was read from the spool
+        self._spool = None
+        # Options are absent from configs predating them
+        spool = getattr(config, 'spool', None)
+        if spool:  # Optional flash backed transmit spool
+            from as_nrf_spool import Spool
+            self._spool = Spool(spool, getattr(config, 'spool_ram', 512))
+            r = self._spool.resume()
+            if r is not None:  # Resend packet in flight at power down
+                self._txpkt.resume(*r)
+                self._txsp = True
+        self._tracer = None
+        trace = getattr(config, 'trace', 0)
+        if trace:  # Optional latency tracing
+            from as_nrf_trace import Tracer
+            sp = self._spool
+            self._tracer = Tracer(trace, len(sp) if sp is not None else 0, len(self._txpkt))
         self._tlast = ticks_ms()  # Time of last communication
         self._txbusy = False  # Don't call ._radio.any() while sending.
 
@@ -126,13 +161,23 @@ class AS_NRF24L01(io.IOBase):
                 if not self._txbusy and (self._radio.any() or self._rxq):
                     ret |= MP_STREAM_POLL_RD
             if arg & MP_STREAM_POLL_WR:
-                if not self._txq:
+                if not self._txq or self._spool is not None:
                     ret |= MP_STREAM_POLL_WR
         return ret
 
-    # .write is called by drain - ioctl postpones until .txq is empty
+    # .write is called by drain - ioctl postpones until .txq is empty unless
+    # there is a spool. Data is spooled once the RAM queue would exceed its
+    # limit, and while the spool holds data (to preserve ordering).
     def write(self, buf):
-        self._txq = bytes(buf)  # Arg is a memoryview
+        if self._tracer is not None:
+            self._tracer.write(len(buf))
+        sp = self._spool
+        if sp is None:
+            self._txq = bytes(buf)  # Arg is a memoryview
+        elif sp or self._txsp or len(self._txq) + len(buf) > sp.ram:
+            sp.write(buf)
+        else:
+            self._txq = b''.join((self._txq, bytes(buf)))
         return len(buf)  # Assume eventual success.
 
     # Return a maximum of one line; ioctl postpones until .rxq is not
@@ -144,6 +189,8 @@ class AS_NRF24L01(io.IOBase):
             return b''
         res = self._rxq[:n]  # Return 1st line on queue
         self._rxq = self._rxq[n:]
+        if self._tracer is not None:
+            self._tracer.read(n)
         return res
 
     def read(self, n):
@@ -151,6 +198,8 @@ class AS_NRF24L01(io.IOBase):
             self._process_packet()
         res = self._rxq[:n]
         self._rxq = self._rxq[n:]
+        if self._tracer is not None:
+            self._tracer.read(len(res))
         return res
 
     # **** private methods ****
@@ -169,15 +218,38 @@ class AS_NRF24L01(io.IOBase):
     # timeout. This is handled by the protocol.
     async def _send(self, buf):
         self._listen(False)
-        await asyncio.sleep_ms(SEND_DELAY)  # Give remote time to start listening
+        await asyncio.sleep_ms(self._send_delay)  # Give remote time to start listening
+        await self._xmit(self._radio, buf)
+        self._listen(True)  # Turn off tx
+
+    async def _xmit(self, radio, buf):
+        if self._tracer is not None:
+            self._tracer.stamp(buf)
         t = ticks_ms()
-        self._radio.send_start(buf)  # Initiate tx
-        while self._radio.send_done() is None:  # tx in progress
+        radio.send_start(buf)  # Initiate tx
+        while radio.send_done() is None:  # tx in progress
             if ticks_diff(ticks_ms(), t) > self._tx_ms:
                 self._do_stats(S_TX_TIMEOUTS)  # Optionally count instances
                 break
             await asyncio.sleep_ms(0)  # Await completion, timeout or failure
-        self._listen(True)  # Turn off tx
+
+    # Last packet was acknowledged: create the next one. When the tx queue is
+    # empty refill it from the spool (if any) and record progress.
+    def _txnext(self):
+        sp = self._spool
+        tr = self._tracer
+        lim = 30 if tr is None else tr.limit()
+        if sp is None:
+            self._txq = self._txpkt.update(self._txq, lim)
+        else:
+            n = len(self._txpkt) if self._txsp else 0  # Spooled bytes delivered
+            if not self._txq:
+                self._txq = sp.read()
+                self._txsp = bool(self._txq)
+            self._txq = self._txpkt.update(self._txq, lim)
+            sp.commit(n, len(self._txpkt) if self._txsp else 0, self._txpkt._pid)
+        if tr is not None:
+            tr.newpkt(len(self._txpkt))
 
     # Update an individual statistic
     def _stat_update(self, idx):
@@ -191,20 +263,39 @@ class AS_NRF24L01(io.IOBase):
     def stats(self):
         return self._stats
 
+    # Latency breakdowns of recently received traced messages, or None if
+    # tracing is disabled.
+    def traces(self):
+        return None if self._tracer is None else self._tracer.traces()
+
+    def clock_offset(self):  # Estimated peer ticks_ms minus local ticks_ms
+        return None if self._tracer is None else self._tracer.offset()
+
+    # Alter protocol parameters while running. Both nodes must make the same
+    # change to channel: in the interim the protocol retransmits as in an
+    # outage. Master and Slave only: used by as_nrf_tune.
+    def retune(self, channel=None, tx_ms=None, send_delay=None):
+        if channel is not None:
+            self._radio.set_channel(channel)
+        if tx_ms is not None:
+            self._tx_ms = tx_ms
+        if send_delay is not None:
+            self._send_delay = send_delay
+
 # Master sends one ACK. If slave doesn't receive the ACK it retransmits same data.
 # Master discards it as a dupe and sends another ACK.
 class Master(AS_NRF24L01):
     def __init__(self, config):
         from uasyncio import Event
-        super().__init__(config)
+        super().__init__(config, 1)
         self._txcmd = MSG
         self._pkt_rec = Event()
         asyncio.create_task(self._run())
 
     async def _run(self):
-        # Await incoming for 1.5x max slave transmit time
-        rx_time = int(SEND_DELAY + 1.5 * self._tx_ms) / 1000  # Seem to have lost wait_for_ms
         while True:
+            # Await incoming for 1.5x max slave transmit time
+            rx_time = int(self._send_delay + 1.5 * self._tx_ms) / 1000  # Seem to have lost wait_for_ms
             self._pkt_rec.clear()
             await self._send(self._txpkt(self._txcmd))
             # Default command for next packet may be changed by ._process_packet
@@ -214,13 +305,14 @@ class Master(AS_NRF24L01):
             except asyncio.TimeoutError:
                 self._do_stats(S_RX_TIMEOUTS)  # Loop again to retransmit pkt.
             else:  # Pkt was received so last was acknowledged. Create the next one.
-                self._txq = self._txpkt.update(self._txq)
+                self._txnext()
                 self._is_running = True  # Start gathering stats now
 
     # A packet is ready. Any response implies an ACK: slave never transmits
     # unsolicited messages
     def _process_packet(self):
-        rxdata, _, dupe, pwrup = self._rxpkt(self._radio.recv())
+        buf = self._radio.recv()
+        rxdata, _, dupe, pwrup = self._rxpkt(buf)
         if pwrup:  # Slave has had a power outage
             self._rxq = b''
         self._tlast = ticks_ms()  # User outage detection
@@ -231,15 +323,18 @@ class Master(AS_NRF24L01):
             if not dupe:  # Add new packets to receive queue
                 self._do_stats(S_RX_DATA)
                 self._rxq = b''.join((self._rxq, rxdata))
+        if self._tracer is not None:
+            self._tracer.rx(buf, rxdata, dupe, pwrup, len(self._rxq))
 
 class Slave(AS_NRF24L01):
     def __init__(self, config):
-        super().__init__(config)
+        super().__init__(config, 0)
         self._listen(True)
         self._is_running = True  # Start gathering stats immediately
 
     def _process_packet(self):
-        rxdata, rxcmd, dupe, pwrup = self._rxpkt(self._radio.recv())
+        buf = self._radio.recv()
+        rxdata, rxcmd, dupe, pwrup = self._rxpkt(buf)
         if pwrup:  # Master has had a power outage
             self._rxq = b''
         self._tlast = ticks_ms()
@@ -248,8 +343,115 @@ class Slave(AS_NRF24L01):
             if not dupe:  # New data received.
                 self._do_stats(S_RX_DATA)
                 self._rxq = b''.join((self._rxq, rxdata))
+        if self._tracer is not None:
+            self._tracer.rx(buf, rxdata, dupe, pwrup, len(self._rxq))
         # If last packet was empty or was acknowledged, get next one.
         if (rxcmd == ACK) or not self._txpkt:
-            self._txq = self._txpkt.update(self._txq)  # Replace txq
+            self._txnext()  # Replace txq
         asyncio.create_task(self._send(self._txpkt(MSG)))
         # Issues start_listening when done.
+
+# Duplex nodes have two radios. Data from DuplexMaster to DuplexSlave is sent
+# on config.channel, data in the other direction on config.channel2. Each node
+# transmits on one radio and listens continuously on the other, so there is no
+# turnround delay. Each packet carries the node's own data and acknowledges the
+# last data packet received from its peer. A node resends a data packet until
+# it is acknowledged; the peer discards duplicates by PID.
+# On power up a node sends empty packets with SYN set. The peer responds with
+# SYNACK and its acknowledge state. This enables a rebooted node to set its
+# PID so that new data is not discarded as a duplicate, and to recognise that a
+# spooled packet in flight at power down has already been received.
+class Duplex(AS_NRF24L01):
+    def __init__(self, config, master):
+        from uasyncio import Event
+        super().__init__(config, master)
+        radio = NRF24L01(config.spi2, config.csn2, config.ce2, config.channel2, 32)
+        radio.open_tx_pipe(self.pipes[master ^ 1])
+        radio.open_rx_pipe(1, self.pipes[master])
+        if master:  # Transmit on channel, receive on channel2
+            self._txradio, self._radio = self._radio, radio
+        else:
+            self._txradio = radio
+        self._radio.start_listening()
+        self._synced = False  # Peer has responded to SYN
+        self._synack = False  # Peer has sent SYN: respond
+        self._ackrq = False  # Peer's data needs acknowledging
+        self._evt = Event()  # Data to send or acknowledge
+        self._is_running = True
+        asyncio.create_task(self._run())
+
+    def write(self, buf):
+        n = super().write(buf)
+        self._evt.set()
+        return n
+
+    def _cmd(self):  # Command byte for next packet
+        cmd = 0 if self._synced else SYN
+        pid = self._rxpkt._pid  # PID of last data received (None if none)
+        if pid is not None:
+            cmd |= DACK | (DPID if pid else 0)
+        if self._synack:
+            cmd |= SYNACK
+            self._synack = False
+        self._ackrq = False
+        return cmd
+
+    async def _run(self):
+        while True:
+            if self._synced and not self._txpkt:  # Get data if any
+                self._txnext()
+            self._evt.clear()
+            await self._xmit(self._txradio, self._txpkt(self._cmd()))
+            if self._ackrq or self._synack:
+                continue  # Respond immediately
+            # Await ACK of a payload, new data to send or peer data to ACK.
+            # Empty packets double as keepalives.
+            t = DUPLEX_RETRY if self._txpkt or not self._synced else DUPLEX_IDLE
+            try:
+                await asyncio.wait_for(self._evt.wait(), t / 1000)
+            except asyncio.TimeoutError:
+                if self._txpkt:
+                    self._do_stats(S_RX_TIMEOUTS)
+
+    # Check whether an incoming acknowledge state refers to the current packet
+    def _acked(self, rxcmd):
+        return rxcmd & DACK and bool(rxcmd & DPID) == bool(self._txpkt._pid)
+
+    def _process_packet(self):
+        buf = self._radio.recv()
+        rxdata, rxcmd, dupe, pwrup = self._rxpkt(buf)
+        if pwrup:  # Peer has had a power outage
+            self._rxq = b''
+        self._tlast = ticks_ms()
+        if rxcmd & SYN:
+            self._synack = True
+            self._evt.set()
+        if rxdata:
+            self._do_stats(S_RX_ALL)  # Optionally count instances
+            self._ackrq = True  # ACK even if a dupe.
+            self._evt.set()
+            if not dupe:  # Add new packets to receive queue
+                self._do_stats(S_RX_DATA)
+                self._rxq = b''.join((self._rxq, rxdata))
+        if rxcmd & SYNACK and not self._synced:
+            self._synced = True
+            self._txpkt._ploads = 2  # PWR only accompanies SYN
+            if self._txpkt:  # Resumed spooled packet
+                if self._acked(rxcmd):  # Peer already has it
+                    self._txnext()
+            elif rxcmd & DACK:  # Next payload must differ from peer's last PID
+                self._txpkt._pid = PID if rxcmd & DPID else 0
+            self._evt.set()
+        elif self._synced and self._txpkt and self._acked(rxcmd):
+            self._txnext()
+            self._evt.set()
+        if self._tracer is not None:
+            self._tracer.rx(buf, rxdata, dupe, pwrup, len(self._rxq))
+
+class DuplexMaster(Duplex):
+    def __init__(self, config):
+        super().__init__(config, 1)
+
+class DuplexSlave(Duplex):
+    def __init__(self, config):
+        super().__init__(config, 0)
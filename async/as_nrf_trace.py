@@ -0,0 +1,151 @@
+# as_nrf_trace.py Optional latency tracing for as_nrf_stream
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# Packets with the TRC bit set carry a 16 byte trace record in bytes 16-31,
+# limiting their payload to 14 bytes. Empty packets always carry one, as does
+# the last packet of each sampled message. The record holds the sender's
+# ticks_ms at transmission, an echo of the last such value received from the
+# peer, and the time since that was received. This yields an NTP style
+# estimate of the offset between the nodes' clocks. The last packet of a
+# sampled message also holds its queue, transmit and retransmit times.
+
+import ustruct
+from time import ticks_ms, ticks_diff, ticks_add
+from micropython import const
+
+TRC = const(0x20)  # Command bit: packet carries a trace record
+_FMT = '<IIHHHH'  # tsend, echo, hold, queue, transmit, retransmit
+_OFFS = const(16)  # Offset of record in packet
+_MAXPL = const(14)  # Max payload of a packet with a record
+_NONE = const(0xffff)  # Hold value denoting no echo
+_NSAMPLES = const(8)  # Clock filter window
+_NTRACES = const(8)  # No. of breakdowns retained
+
+def _ms(t):  # Clip a duration to the record field
+    return min(max(t, 0), 0xfffe)
+
+class Tracer:
+    # Sample one message in every n. backlog is the no. of spooled bytes
+    # awaiting transmission, inflight the length of a resumed packet.
+    def __init__(self, n, backlog=0, inflight=0):
+        self._n = n
+        self._nw = 0  # Count of writes
+        # Sender: stream positions of bytes written and bytes packetised.
+        self._w = backlog
+        self._p = inflight
+        self._s = 0  # Start and end of sampled message
+        self._e = None  # None: no message being traced
+        self._tw = 0  # Time of write
+        self._t0 = None  # Time of first transmission of message
+        self._rt = 0  # Time spent retransmitting
+        self._first = False  # Current packet holds start of message
+        self._tag = False  # Current packet holds end of message
+        self._new = True  # Current packet has not yet been sent
+        self._tsend = 0  # Time of last transmission
+        # Clock
+        self._echo = None  # Peer's last tsend and local time of its receipt
+        self._trx = 0
+        self._samples = []  # (rtt, offset)
+        self._offset = None  # Peer clock minus local clock
+        # Receiver
+        self._rxend = None  # Bytes to be read before traced message is done
+        self._rxrec = None
+        self._traces = []
+
+    # **** Sender ****
+    def write(self, n):  # n bytes were queued for transmission
+        self._nw += 1
+        if self._e is None and not self._nw % self._n:
+            self._s = self._w
+            self._e = self._w + n
+            self._tw = ticks_ms()
+            self._t0 = None
+            self._rt = 0
+        self._w += n
+
+    def limit(self):  # Max length of next packet: end of message in a traced packet
+        if self._e is not None and not self._tag:
+            n = self._e - self._p
+            if n <= _MAXPL:
+                return n
+            if n < 30 + _MAXPL:
+                return n - _MAXPL
+        return 30
+
+    def newpkt(self, n):  # A packet holding n bytes was created
+        if self._tag:  # Traced message was delivered
+            self._e = None
+            self._tag = False
+        e = self._e
+        self._first = e is not None and self._p <= self._s < self._p + n
+        self._p += n
+        self._tag = e is not None and n > 0 and self._p == e
+        self._new = True
+
+    def stamp(self, buf):  # Packet buf is about to be transmitted
+        t = ticks_ms()
+        if self._new:
+            if self._first:
+                self._t0 = t
+        elif self._t0 is not None:
+            self._rt += ticks_diff(t, self._tsend)
+        self._new = False
+        self._tsend = t
+        if buf[1] and not self._tag:  # Untraced data packet
+            return
+        buf[0] |= TRC
+        echo, hold = 0, _NONE
+        if self._echo is not None:
+            echo = self._echo
+            hold = _ms(ticks_diff(t, self._trx))
+        q = tx = rt = 0
+        if self._tag:
+            q = _ms(ticks_diff(self._t0, self._tw))
+            rt = _ms(self._rt)
+            tx = _ms(ticks_diff(t, self._t0) - self._rt)
+        ustruct.pack_into(_FMT, buf, _OFFS, t, echo, hold, q, tx, rt)
+
+    # **** Receiver ****
+    # Called after a packet is processed. nrx is the length of the rx queue.
+    def rx(self, buf, rxdata, dupe, pwr, nrx):
+        if pwr:  # Peer power cycled: rx queue was cleared
+            self._rxend = None
+        if not buf[0] & TRC:
+            return
+        t = ticks_ms()
+        ts, echo, hold, q, tx, rt = ustruct.unpack_from(_FMT, buf, _OFFS)
+        self._echo = ts
+        self._trx = t
+        if hold != _NONE:  # Our echoed tsend: update clock offset
+            rtt = ticks_diff(t, echo) - hold
+            off = (ticks_diff(ts, echo) - hold + ticks_diff(ts, t)) // 2
+            s = self._samples
+            s.append((rtt, off))
+            if len(s) > _NSAMPLES:
+                s.pop(0)
+            self._offset = min(s)[1]  # Sample with least rtt is most accurate
+        if rxdata and not dupe:  # Last packet of a traced message
+            air = None
+            if self._offset is not None:
+                air = ticks_diff(t, ticks_add(ts, -self._offset))
+            self._rxend = nrx
+            self._rxrec = [q, tx, rt, air, t]
+
+    def read(self, n):  # n bytes were read from the rx queue
+        if self._rxend is not None:
+            self._rxend -= n
+            if self._rxend <= 0:
+                r = self._rxrec
+                r[4] = ticks_diff(ticks_ms(), r[4])  # Delivery time
+                self._traces.append(tuple(r))
+                if len(self._traces) > _NTRACES:
+                    self._traces.pop(0)
+                self._rxend = None
+
+    def traces(self):
+        return self._traces
+
+    def offset(self):
+        return self._offset
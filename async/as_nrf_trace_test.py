@@ -0,0 +1,60 @@
+# as_nrf_trace_test.py Demo of latency tracing using simulated radios
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# Both nodes run on one target using simulated radios: no hardware is needed.
+# Each node sends lines to the other and traces one message in four. The
+# latency breakdowns measured by Slave are printed periodically.
+
+import sim_nrf
+sim_nrf.install()  # Must precede import of as_nrf_stream
+import uasyncio as asyncio
+from as_nrf_stream import Master, Slave
+from asconfig import RadioSetup
+
+async def sender(device, interval, linelen):
+    swriter = asyncio.StreamWriter(device, {})
+    pad = 'x' * (linelen - 6)
+    n = 0
+    while True:
+        swriter.write('{:05d}{}\n'.format(n, pad).encode())
+        await swriter.drain()
+        await asyncio.sleep_ms(interval)
+        n += 1
+
+async def receiver(device):
+    sreader = asyncio.StreamReader(device)
+    while True:
+        await sreader.readline()
+
+async def report(device, secs):
+    msg = '{:6d}{:6d}{:6d}{:6d}{:6d}'
+    for _ in range(secs):
+        await asyncio.sleep(1)
+        print('Clock offset {}ms'.format(device.clock_offset()))
+        print(' Queue    Tx Retx   Air  Read (ms)')
+        for t in device.traces():
+            print(msg.format(*(-1 if x is None else x for x in t)))
+
+async def main(loss, linelen, secs):
+    sim_nrf.ether.loss = loss
+    master = Master(RadioSetup(None, None, None, True, trace=4))
+    slave = Slave(RadioSetup(None, None, None, True, trace=4))
+    for device, interval in ((master, 50), (slave, 77)):
+        asyncio.create_task(sender(device, interval, linelen))
+        asyncio.create_task(receiver(device))
+    await report(slave, secs)
+
+def test(loss=0, linelen=60, secs=10):
+    try:
+        asyncio.run(main(loss, linelen, secs))
+    finally:  # Reset uasyncio case of KeyboardInterrupt
+        asyncio.new_event_loop()
+
+msg = '''Latency tracing demo for as_nrf_stream using simulated radios.
+Issue
+as_nrf_trace_test.test()
+Optional args: loss=0, linelen=60, secs=10
+'''
+print(msg)
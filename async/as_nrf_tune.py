@@ -0,0 +1,240 @@
+# as_nrf_tune.py Calibration of as_nrf_stream protocol parameters
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# Both nodes run calibration together: the master runs a Tuner, the slave runs
+# echo(). Starting from the configured values the Tuner sweeps channel, tx_ms,
+# send_delay and message length in turn, retaining the best value of each.
+# Before each trial it sends the parameters to the slave and both nodes switch
+# to them. It then measures the
+# round trip time of short messages, the throughput of longer ones echoed by
+# the slave, and retransmissions from both drivers' statistics. If the link
+# fails both nodes revert to the configured parameters. The recommended
+# parameters are output in asconfig.py format.
+
+import uasyncio as asyncio
+from time import ticks_ms, ticks_diff
+from micropython import const
+from as_nrf_stream import Master, Slave, SEND_DELAY, S_RX_TIMEOUTS, S_TX_TIMEOUTS, S_RX_ALL, S_RX_DATA
+
+SETTLE_MS = const(1000)  # Slave delay between confirming a trial and starting it
+REVERT_MS = const(3000)  # Slave reverts to its config after this period of silence
+FAIL_MS = const(5000)  # Master abandons a trial if a response takes longer
+
+def _params(config):  # Configured channel, tx_ms and send_delay
+    return config.channel, config.tx_ms, getattr(config, 'send_delay', SEND_DELAY)
+
+# Retransmissions and no. of new data packets received, from stats list
+def _counts(stats):
+    dupes = stats[S_RX_ALL] - stats[S_RX_DATA]
+    return stats[S_RX_TIMEOUTS] + stats[S_TX_TIMEOUTS] + dupes, stats[S_RX_DATA]
+
+# Run on the slave. Echoes lines, and applies trial parameters from the master.
+# Reading continues while echoes are pending: a Slave only responds to the
+# master while its input is being read.
+async def echo(config):
+    config.stats = True  # Statistics are needed by the Tuner
+    device = Slave(config)
+    base = _params(config)
+    tuned = False
+    lines = []  # Awaiting echo
+    evt = asyncio.Event()
+
+    async def writer():
+        nonlocal tuned
+        swriter = asyncio.StreamWriter(device, {})
+        while True:
+            await evt.wait()
+            evt.clear()
+            while lines:
+                line = lines.pop(0)
+                swriter.write(line)
+                await swriter.drain()
+                if line.startswith(b'T'):  # Trial: give confirmation time to be sent
+                    await asyncio.sleep_ms(SETTLE_MS)
+                    device.retune(*(int(x) for x in line.split()[2:]))
+                    tuned = True
+
+    async def watchdog():  # Revert if the master can't be heard
+        nonlocal tuned
+        while True:
+            await asyncio.sleep_ms(500)
+            if tuned and device.t_last_ms() > REVERT_MS:
+                device.retune(*base)
+                tuned = False
+
+    asyncio.create_task(writer())
+    asyncio.create_task(watchdog())
+    sreader = asyncio.StreamReader(device)
+    while True:
+        line = await sreader.readline()
+        if line:
+            if line.startswith(b'S'):  # Stats request: append counts
+                line = '{} {} {}\n'.format(line.decode().rstrip(), *_counts(device.stats())).encode()
+            lines.append(line)
+            evt.set()
+
+# Run on the master. Sweep lists may be replaced. The configured channel is
+# always tried. secs is the duration of each throughput measurement.
+class Tuner:
+    def __init__(self, config, channels=(85, 90, 95, 99), tx_ms=(20, 50, 100, 200),
+                 send_delays=(2, 5, 10, 20), msglens=(30, 45, 60, 120), secs=3):
+        config.stats = True
+        self._device = Master(config)
+        self._base = _params(config)
+        if config.channel not in channels:
+            channels = (config.channel,) + tuple(channels)
+        self._sweeps = (channels, tx_ms, send_delays)  # Order of .retune args
+        self._msglens = msglens
+        self._secs = secs
+        self._swriter = asyncio.StreamWriter(self._device, {})
+        self._want = b''  # Expected response
+        self._reply = b''  # Actual response
+        self._match = asyncio.Event()
+        self._trial = 0
+        asyncio.create_task(self._reader())
+
+    async def _reader(self):
+        sreader = asyncio.StreamReader(self._device)
+        while True:
+            line = await sreader.readline()
+            if self._want and line.startswith(self._want):
+                self._reply = line
+                self._want = b''
+                self._match.set()
+
+    # Send a line and await a response starting with want (default the line
+    # itself). Return the response or None on timeout.
+    async def _send(self, line, want=None):
+        self._want = line if want is None else want
+        self._match.clear()
+        self._swriter.write(line)
+        await self._swriter.drain()
+        try:
+            await asyncio.wait_for(self._match.wait(), FAIL_MS / 1000)
+        except asyncio.TimeoutError:
+            self._want = b''
+            return None
+        return self._reply
+
+    async def _peer_counts(self):  # Retransmissions and data packets of slave
+        line = 'S {}'.format(self._trial).encode()
+        res = await self._send(line + b'\n', line + b' ')
+        return None if res is None else [int(x) for x in res.split()[2:]]
+
+    async def _sync(self, revert=True):  # Wait for link on configured parameters
+        if revert:
+            self._device.retune(*self._base)
+            await asyncio.sleep_ms(REVERT_MS + SETTLE_MS)  # Slave reverts
+        while await self._send('P {} sync\n'.format(self._trial).encode()) is None:
+            pass
+
+    # Run a trial. Return (throughput, RTT, loss%) or None on link failure.
+    async def _run(self, params, msglen):
+        self._trial += 1
+        k = self._trial
+        if await self._send('T {} {} {} {}\n'.format(k, *params).encode()) is None:
+            return None
+        self._device.retune(*params)
+        if await self._send('P {} 0\n'.format(k).encode()) is None:  # Link is up
+            return None
+        peer = await self._peer_counts()
+        local = _counts(self._device.stats())
+        t = ticks_ms()
+        for n in range(10):  # Round trip time
+            if await self._send('P {} {}\n'.format(k, n).encode()) is None:
+                return None
+        rtt = ticks_diff(ticks_ms(), t) // 10
+        pad = 'x' * msglen
+        n = 0
+        t = ticks_ms()
+        while ticks_diff(ticks_ms(), t) < self._secs * 1000:
+            line = 'D {} {} '.format(k, n)
+            self._swriter.write('{}{}\n'.format(line, pad[len(line) + 1:]).encode())
+            await self._swriter.drain()
+            n += 1
+        # Throughput is measured to the echo of the last line: both directions
+        if await self._send('D {} end\n'.format(k).encode()) is None:
+            return None
+        rate = 2 * n * msglen * 1000 // ticks_diff(ticks_ms(), t)
+        peer1 = await self._peer_counts()
+        if peer is None or peer1 is None:
+            return None
+        local1 = _counts(self._device.stats())
+        retx = local1[0] - local[0] + peer1[0] - peer[0]
+        pkts = local1[1] - local[1] + peer1[1] - peer[1]
+        return rate, rtt, 100 * retx // max(retx + pkts, 1)
+
+    async def _trial_result(self, params, msglen):
+        res = await self._run(params, msglen)
+        name = 'Channel {:3d} tx_ms {:3d} send_delay {:2d} length {:3d}'.format(params[0], params[1], params[2], msglen)
+        if res is None:
+            print('{}  Link failed'.format(name))
+            await self._sync()
+        else:
+            print('{}  {:5d} bytes/s RTT {:4d}ms Loss {:2d}%'.format(name, *res))
+        return res
+
+    # Sweep each parameter in turn. Return the recommended config as text.
+    async def run(self):
+        await self._sync(False)
+        best = list(self._base)
+        msglen = self._msglens[0]
+        top = None  # Best result
+        for idx, sweep in enumerate(self._sweeps):
+            current = best[idx]
+            for value in sweep:
+                best[idx] = value
+                res = await self._trial_result(best, msglen)
+                if res is not None and (top is None or res[0] > top[0]):
+                    top = res
+                    current = value
+            best[idx] = current
+        lengths = []  # (length, bytes/s)
+        for value in self._msglens:
+            res = await self._trial_result(best, value)
+            if res is not None:
+                lengths.append((value, res[0]))
+        await self._send('T {} {} {} {}\n'.format(self._trial + 1, *self._base).encode())
+        self._device.retune(*self._base)
+        if top is None:
+            return '# as_nrf_tune: no trial succeeded\n'
+        lines = ['# Calibrated by as_nrf_tune: {} bytes/s RTT {}ms Loss {}%'.format(*top),
+                 'RadioSetup.channel = {}'.format(best[0]),
+                 'RadioSetup.tx_ms = {}'.format(best[1]),
+                 'RadioSetup.send_delay = {}'.format(best[2])]
+        for length, rate in lengths:
+            lines.append('# Messages of {} bytes: {} bytes/s'.format(length, rate))
+        return '\n'.join(lines) + '\n'
+
+# Calibrate hardware configured in asconfig.py. On the master the result is
+# printed and optionally written to a file.
+def calibrate(master=True, fname=None, **kwargs):
+    from asconfig import config_master, config_slave
+
+    async def main():
+        if master:
+            res = await Tuner(config_master, **kwargs).run()
+            print(res)
+            if fname is not None:
+                with open(fname, 'w') as f:
+                    f.write(res)
+        else:
+            await echo(config_slave)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print('Interrupted')
+    finally:
+        asyncio.new_event_loop()
+
+msg = '''Calibration of as_nrf_stream parameters.
+On slave issue as_nrf_tune.calibrate(False)
+On master issue as_nrf_tune.calibrate()
+Optional args to master: fname=None, channels=(85, 90, 95, 99),
+tx_ms=(20, 50, 100, 200), send_delays=(2, 5, 10, 20),
+msglens=(30, 45, 60, 120), secs=3
+'''
+print(msg)
@@ -0,0 +1,35 @@
+# as_nrf_tune_test.py Run as_nrf_tune calibration using simulated radios
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# Both nodes run on one target: no hardware is needed. Packet loss may be set
+# globally and for individual channels, e.g. to check that calibration avoids
+# a congested channel.
+
+import sim_nrf
+sim_nrf.install()  # Must precede import of as_nrf_stream
+import uasyncio as asyncio
+from as_nrf_tune import Tuner, echo
+from asconfig import RadioSetup
+
+async def main(loss, chloss, kwargs):
+    sim_nrf.ether.reset()
+    sim_nrf.ether.loss = loss
+    sim_nrf.ether.chloss = chloss
+    asyncio.create_task(echo(RadioSetup(None, None, None)))
+    print(await Tuner(RadioSetup(None, None, None), **kwargs).run())
+
+def test(loss=0.1, chloss={85: 0.5, 99: 1}, **kwargs):
+    try:
+        asyncio.run(main(loss, chloss, kwargs))
+    finally:  # Reset uasyncio case of KeyboardInterrupt
+        asyncio.new_event_loop()
+
+msg = '''Calibration of as_nrf_stream using simulated radios.
+Issue
+as_nrf_tune_test.test()
+Optional args: loss=0.1, chloss={85: 0.5, 99: 1} (loss of specific channels)
+and those of as_nrf_tune.Tuner e.g. secs=3
+'''
+print(msg)
@@ -3,18 +3,29 @@ from machine import SPI, Pin
 # config file instantiates a RadioSetup for each end of the link
 class RadioSetup:  # Configuration for an nRF24L01 radio
     channel = 97  # Necessarily shared by both instances
+    channel2 = 93  # Channel of second radio (Duplex only)
     tx_ms = 200  # Max ms either end waits for successful transmission
+    send_delay = 10  # ms before transmit: gives remote time to turn round
 
-    def __init__(self, spi, csn, ce, stats=False):
+    def __init__(self, spi, csn, ce, stats=False, spool=None, spool_ram=512, trace=0,
+                 spi2=None, csn2=None, ce2=None):
         self.spi = spi
         self.csn = csn
         self.ce = ce
         self.stats = stats
+        self.spool = spool  # Path of optional transmit spool e.g. '/sd/spool'
+        self.spool_ram = spool_ram  # Bytes queued in RAM before spooling
+        self.trace = trace  # If > 0 trace latency of one message in every trace
+        self.spi2 = spi2  # Second radio (Duplex only)
+        self.csn2 = csn2
+        self.ce2 = ce2
 
 # Note: gathering statistics. as_nrf_test will display them.
 config_testbox = RadioSetup(SPI(1), Pin('X5'), Pin('Y11'), True)  # My testbox
 config_v1 = RadioSetup(SPI(1), Pin('X5'), Pin('X4'), True)  # V1 Micropower PCB
 config_v2 = RadioSetup(SPI(1), Pin('X5'), Pin('X2'), True)  # V2 Micropower PCB with SD card
+# Duplex: second radio on SPI(2)
+config_duplex = RadioSetup(SPI(1), Pin('X5'), Pin('X4'), True, spi2=SPI(2), csn2=Pin('Y5'), ce2=Pin('Y4'))
 config_master = config_v1
 #config_slave = config_v2
 config_slave = config_testbox
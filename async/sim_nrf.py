@@ -0,0 +1,174 @@
+# sim_nrf.py Simulated nRF24L01 radios for testing protocols without hardware
+
+# (C) Peter Hinch 2020
+# Released under the MIT licence
+
+# The NRF24L01 class mimics the API of the official driver. All instances
+# share the module-level Ether which models packet loss, outages and time on
+# air. To use it, call install() before importing a driver: the driver then
+# instantiates simulated radios. SPI and Pin arguments are ignored.
+
+import sys
+from time import ticks_us, ticks_diff, ticks_add
+from random import getrandbits
+from micropython import const
+
+# Registers emulated by reg_read and reg_write
+EN_AA = const(0x01)
+SETUP_RETR = const(0x04)
+STATUS = const(0x07)  # Read only: RX_P_NO field
+# Power and speed constants required by drivers
+POWER_0 = const(0x00)
+POWER_1 = const(0x02)
+POWER_2 = const(0x04)
+POWER_3 = const(0x06)
+SPEED_1M = const(0x00)
+SPEED_2M = const(0x08)
+SPEED_250K = const(0x20)
+
+def install():  # Cause subsequent driver imports to use simulated radios
+    sys.modules['nrf24l01'] = sys.modules[__name__]
+
+class Ether:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):  # Remove all radios e.g. between benchmarks
+        self.loss = 0  # Probability of losing any one packet or ACK (0.0-1.0)
+        self.chloss = {}  # Loss of specific channels e.g. {97: 0.5}: overrides .loss
+        self.up = True  # False simulates an outage
+        self.air_us = 1500  # Time on air of a 32 byte packet at 250Kbps
+        self.packets = 0  # Count of transmission attempts
+        self._radios = []
+
+    def _lost(self, channel):
+        loss = self.chloss.get(channel, self.loss)
+        return not self.up or getrandbits(16) < int(loss * 65536)
+
+    def _air(self, n):  # Time on air of an n byte payload. 9 bytes overhead.
+        return self.air_us * (n + 9) // 41
+
+    # Transmit a packet. ESB retransmissions are modelled: receivers store a
+    # packet once only. Return the no. of attempts and whether an ACK arrived.
+    def _transmit(self, tx, buf):
+        t = ticks_us()
+        aa = tx.reg_read(EN_AA) & 1
+        retr = tx.reg_read(SETUP_RETR)
+        arc = retr & 0x0f if aa else 0
+        ard = ((retr >> 4) + 1) * 250  # Auto retransmit delay
+        air = self._air(len(buf))
+        ch = tx._channel
+        got = []
+        for n in range(arc + 1):
+            self.packets += 1
+            acked = False
+            due = ticks_add(t, n * (air + ard) + air)
+            for rx in self._radios:
+                pipe = rx._match(tx)
+                if pipe < 0 or self._lost(ch) or (rx not in got and len(rx._fifo) >= 3):
+                    continue  # Not addressed, lost or FIFO full
+                if rx not in got:
+                    got.append(rx)
+                    rx._fifo.append((due, buf, pipe))
+                if aa and (rx.reg_read(EN_AA) >> pipe) & 1 and not self._lost(ch):
+                    acked = True
+            if acked or not aa:
+                return n + 1, True
+        return arc + 1, False
+
+ether = Ether()
+
+class NRF24L01:
+    def __init__(self, spi, cs, ce, channel=46, payload_size=16):
+        assert payload_size <= 32
+        self.payload_size = payload_size
+        self._regs = {EN_AA: 0x3f, SETUP_RETR: (6 << 4) | 8}
+        self._channel = min(channel, 125)
+        self._tx_addr = None
+        self._rx_addr = {}  # Address of each open pipe
+        self._fifo = []  # (time due, packet, pipe no.)
+        self._listening = False
+        self._tsend = None  # Start and duration of current transmission
+        self._dt = 0
+        self._ok = False
+        ether._radios.append(self)
+
+    def _match(self, tx):  # Return pipe no. matching transmitter or -1
+        if self._listening and self is not tx and self._channel == tx._channel:
+            for pipe, addr in self._rx_addr.items():
+                if addr == tx._tx_addr:
+                    return pipe
+        return -1
+
+    def reg_read(self, reg):
+        if reg == STATUS:  # Pipe no. of packet at head of FIFO, 7 if none
+            return (self._fifo[0][2] if self.any() else 7) << 1
+        return self._regs.get(reg, 0)
+
+    def reg_write(self, reg, value):
+        self._regs[reg] = value
+
+    def flush_rx(self):
+        self._fifo = []
+
+    def flush_tx(self):
+        pass
+
+    def set_power_speed(self, power, speed):
+        pass
+
+    def set_crc(self, length):
+        pass
+
+    def set_channel(self, channel):
+        self._channel = min(channel, 125)
+
+    def open_tx_pipe(self, address):
+        assert len(address) == 5
+        self._tx_addr = bytes(address)
+
+    def open_rx_pipe(self, pipe_id, address):
+        assert len(address) == 5
+        assert 0 <= pipe_id <= 5
+        if pipe_id >= 2:  # Pipes 2-5 share upper bytes with pipe 1
+            address = address[:1] + self._rx_addr[1][1:]
+        self._rx_addr[pipe_id] = bytes(address)
+
+    def start_listening(self):
+        self._listening = True
+        self.flush_rx()
+
+    def stop_listening(self):
+        self._listening = False
+        self.flush_rx()
+
+    def any(self):
+        return bool(self._fifo) and ticks_diff(ticks_us(), self._fifo[0][0]) >= 0
+
+    def recv(self):
+        return self._fifo.pop(0)[1] if self._fifo else bytes(self.payload_size)
+
+    def send(self, buf, timeout=500):
+        self.send_start(buf)
+        start = ticks_us()
+        result = None
+        while result is None and ticks_diff(ticks_us(), start) < timeout * 1000:
+            result = self.send_done()
+        if result is None:
+            raise OSError('timed out')
+        if result == 2:
+            raise OSError('send failed')
+
+    def send_start(self, buf):
+        buf = bytes(buf)
+        assert len(buf) == self.payload_size
+        n, self._ok = ether._transmit(self, buf)
+        retr = self._regs[SETUP_RETR]
+        self._dt = n * ether._air(len(buf)) + (n - 1) * ((retr >> 4) + 1) * 250
+        self._tsend = ticks_us()
+
+    def send_done(self):  # Like the hardware, an outage returns None
+        if self._tsend is None or not ether.up or ticks_diff(ticks_us(), self._tsend) < self._dt:
+            return None  # Not finished
+        self._tsend = None
+        return 1 if self._ok else 2
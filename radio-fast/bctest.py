@@ -0,0 +1,60 @@
+# bctest.py Benchmark of broadcast fan-out against sequential exchanges.
+
+# Author: Peter Hinch
+# Copyright Peter Hinch 2020 Released under the MIT license
+
+# Modify config.py to provide master_config and slave_config for your hardware.
+# Each round the master times nslaves exchanges (one slave stands in for
+# nslaves) and a broadcast. Slaves report broadcasts missed. Exactly one slave
+# should respond to exchanges: others share its address so run them with
+# test_slave(False).
+
+import pyb, radio_fast
+from time import ticks_us, ticks_diff
+from config import master_config, slave_config, FromMaster, ToMaster
+
+st = '''
+On one slave issue bctest.test_slave()
+On any other slaves issue bctest.test_slave(False)
+On master issue bctest.test_master()
+Optional args to test_master: nslaves=8, repeats=2, rounds=100
+'''
+
+print(st)
+
+def test_master(nslaves=8, repeats=2, rounds=100):
+    m = radio_fast.Master(master_config)
+    send_msg = FromMaster()
+    t_ex = t_bc = fails = 0
+    for n in range(rounds):
+        send_msg.i0 = n
+        t = ticks_us()
+        for _ in range(nslaves):
+            if m.exchange(send_msg) is None:
+                fails += 1
+        t_ex += ticks_diff(ticks_us(), t)
+        t = ticks_us()
+        m.broadcast(send_msg, repeats)
+        t_bc += ticks_diff(ticks_us(), t)
+        pyb.delay(20)
+    print('{} exchanges: {}us per round, {} timeouts.'.format(nslaves, t_ex // rounds, fails))
+    print('Broadcast with {} repeats: {}us per round.'.format(repeats, t_bc // rounds))
+
+def test_slave(respond=True):
+    s = radio_fast.Slave(slave_config)
+    send_msg = ToMaster()
+    rx_msg = FromMaster()
+    last = None
+    missed = 0
+    while True:
+        if respond:
+            s.exchange(send_msg, block = False)
+        else:
+            s.get_latest_msg(rx_msg)  # Discard exchange messages
+        result = s.get_broadcast()
+        if result is not None:
+            if last is not None and result.i0 != last + 1:
+                missed += max(result.i0 - last - 1, 0)
+            last = result.i0
+            if not result.i0 % 10:
+                print('Broadcast {} received. Missed {} Received {} Duplicates {}'.format(last, missed, *s.bcstats))
@@ -7,6 +7,8 @@ from msg import RadioConfig, msg
 
 # Choose a channel (or accept default 99)
 #RadioConfig.channel = 99
+# Optionally override RadioFast.timeout (ms). rftune.py recommends channel and timeout.
+#RadioConfig.timeout = 100
 # Modify for your hardware
 testbox_config = RadioConfig(spi_no = 1, csn_pin = 'X5', ce_pin = 'Y11') # My testbox
 v1_config = RadioConfig(spi_no = 1, csn_pin = 'X5', ce_pin = 'X4')   # V1 Micropower PCB
@@ -4,6 +4,7 @@ import ustruct
 
 class RadioConfig(object):                      # Configuration for an nRF24L01 radio
     channel = 99                                # Necessarily shared by master and slave instances.
+    timeout = None                              # If set (ms) overrides RadioFast.timeout
     def __init__(self, *, spi_no, csn_pin, ce_pin):# May differ between instances
         self.spi_no = spi_no
         self.ce_pin = ce_pin
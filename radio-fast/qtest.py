@@ -0,0 +1,63 @@
+# qtest.py Benchmark of queued receive mode.
+
+# Author: Peter Hinch
+# Copyright Peter Hinch 2020 Released under the MIT license
+
+# Modify config.py to provide master_config and slave_config for your hardware.
+# The master streams records as fast as it can. The slave copies them from the
+# radio to its queue in a tight loop but only processes them every period ms,
+# simulating an application which is busy with other work. Every 5s it reports
+# the sustained record rate, records dropped because the queue was full, and
+# records lost on the radio link (not acknowledged by the slave). With qlen=0
+# the slave uses get_latest_msg for comparison: records overwritten between
+# calls count as dropped.
+
+import pyb, radio_fast
+from time import ticks_ms, ticks_diff
+from config import master_config, slave_config, FromMaster
+
+st = '''
+On slave issue qtest.test_slave()
+On master issue qtest.test_master()
+Optional args to test_slave: qlen=16, period=20
+'''
+
+print(st)
+
+def test_master():
+    m = radio_fast.Master(master_config)
+    send_msg = FromMaster()
+    while True:
+        m.sendbuf(send_msg)
+        send_msg.i0 += 1
+
+def test_slave(qlen=16, period=20):
+    s = radio_fast.Slave(slave_config, qlen)
+    rx_msg = FromMaster()
+    got = missed = 0
+    last = None
+    tproc = tstart = ticks_ms()
+    while True:
+        if qlen:
+            s.poll()
+        if ticks_diff(ticks_ms(), tproc) < period:
+            continue
+        tproc = ticks_ms()
+        if qlen:
+            batch = s.drain()
+        else:  # At most one record
+            batch = ((0, rx_msg.buf),) if s.get_latest_msg(rx_msg) else ()
+        for _, data in batch:
+            rx_msg.store(data)
+            i0 = rx_msg.unpack().i0
+            if last is not None:
+                missed += i0 - last - 1
+            last = i0
+            got += 1
+        t = ticks_diff(ticks_ms(), tstart)
+        if t >= 5000:
+            dropped = s.qstats[1] if qlen else missed
+            print('{} records/s processed. Dropped {} Lost on link {}'.format(got * 1000 // t, dropped, missed - dropped))
+            got = missed = 0
+            s.qstats[1] = 0
+            tstart = ticks_ms()
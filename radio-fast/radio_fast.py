@@ -4,31 +4,110 @@
 
 from machine import SPI, Pin
 from time import ticks_diff, ticks_ms
+from micropython import const
 from nrf24l01 import NRF24L01, POWER_3, SPEED_250K
 from config import FromMaster, ToMaster  # User defined message classes and hardware config
 
+# nRF24L01 registers not exported by the driver
+EN_AA = const(0x01)
+SETUP_RETR = const(0x04)
+STATUS = const(0x07)
+BCAST_PIPE = const(2)  # Slaves receive broadcasts on this pipe
+
 class RadioFast(NRF24L01):
     pipes = (b'\xf0\xf0\xf0\xf0\xe1', b'\xf0\xf0\xf0\xf0\xd2')
+    # Broadcast address. Pipes 2-5 share bytes 1-4 of the pipe 1 address.
+    bcast = b'\xb5' + pipes[0][1:]
     timeout = 100
-    def __init__(self, master, config):
+    def __init__(self, master, config, qlen):
         super().__init__(SPI(config.spi_no), Pin(config.csn_pin), Pin(config.ce_pin), config.channel, FromMaster.payload_size())
+        # Optional queue of received records: a preallocated ring of buffers
+        self._ring = [bytearray(self.payload_size) for _ in range(qlen)]
+        self._mvs = [memoryview(b) for b in self._ring]
+        self._seqs = [0] * qlen  # Sequence no. of each record
+        self._head = 0  # Index of oldest record
+        self._nq = 0  # No. of records queued
+        self.qstats = [0, 0]  # Records received, records dropped because queue full
+        if config.timeout is not None:
+            self.timeout = config.timeout
         if master:
             self.open_tx_pipe(RadioFast.pipes[0])
             self.open_rx_pipe(1, RadioFast.pipes[1])
         else:
             self.open_tx_pipe(RadioFast.pipes[1])
             self.open_rx_pipe(1, RadioFast.pipes[0])
+            if self._bcok():  # Listen for broadcasts
+                self.payload_size += 1
+                self.open_rx_pipe(BCAST_PIPE, RadioFast.bcast)
+                self.payload_size -= 1
+                self.reg_write(EN_AA, self.reg_read(EN_AA) & ~(1 << BCAST_PIPE))
         self.set_power_speed(POWER_3, SPEED_250K)  # Best range for point to point links
         self.start_listening()
 
+    # Broadcasts are prefixed with a sequence number byte so are unavailable
+    # with 32 byte messages.
+    def _bcok(self):
+        return self.payload_size < 32
+
     def get_latest_msg(self, msg_rx):
-        if self.any():
-            while self.any():  # Discard any old buffered messages
+        if self._ring:  # Queued mode: return oldest record
+            for _, data in self.drain(1):
+                msg_rx.store(data)
+                return True
+            return False
+        data = None
+        while self.any():  # Discard any old buffered messages
+            if self._pipe() == BCAST_PIPE:
+                self._bcrx()
+            else:
                 data = self.recv()
+        if data is not None:
             msg_rx.store(data)  # Can raise OSError but only as a result of programming error
             return True
         return False
 
+    # Queued mode. Copy records from the RX FIFO to the queue. Must be called
+    # often enough to prevent the 3-deep FIFO from filling.
+    def poll(self):
+        ring = self._ring
+        n = len(ring)
+        while self.any():
+            if self._pipe() == BCAST_PIPE:
+                self._bcrx()
+                continue
+            data = self.recv()
+            seq = self.qstats[0]
+            self.qstats[0] += 1
+            if self._nq < n:
+                i = (self._head + self._nq) % n
+                ring[i][:] = data
+                self._seqs[i] = seq
+                self._nq += 1
+            else:
+                self.qstats[1] += 1
+
+    # Generator yielding (sequence no., memoryview) for up to n (default all)
+    # queued records, oldest first. Sequence numbers count records read from
+    # the radio: gaps show queue overflow only, not losses on the link or in
+    # the radio's FIFO. Each record is removed from the queue
+    # when yielded: its data is valid until the next call to .poll.
+    def drain(self, n = 0):
+        self.poll()
+        while self._nq:
+            i = self._head
+            self._head = (i + 1) % len(self._ring)
+            self._nq -= 1
+            yield self._seqs[i], self._mvs[i]
+            n -= 1
+            if not n:
+                return
+
+    def _pipe(self):  # Pipe no. of packet at head of RX FIFO
+        return (self.reg_read(STATUS) >> 1) & 7
+
+    def _bcrx(self):  # Overridden by Slave
+        self.recv()
+
     def sendbuf(self, msg_send):
         self.stop_listening()
         try:
@@ -50,8 +129,39 @@ class RadioFast(NRF24L01):
         return False  # Timeout
 
 class Master(RadioFast):
-    def __init__(self, config):
-        super().__init__(True, config)
+    def __init__(self, config, qlen = 0):
+        super().__init__(True, config, qlen)
+        self._seq = 0
+        self._bcbuf = bytearray(self.payload_size + 1)
+
+    # Send a FromMaster message to all slaves without acknowledgement. It is
+    # sent repeats times to improve the chance of reception: slaves discard
+    # duplicates by sequence number.
+    def broadcast(self, msg_send, repeats = 1):
+        if not self._bcok():
+            raise ValueError('Messages too long for broadcast')
+        self._seq = (self._seq + 1) & 0xff
+        buf = self._bcbuf
+        buf[0] = self._seq
+        buf[1:] = msg_send.pack()
+        aa = self.reg_read(EN_AA)
+        retr = self.reg_read(SETUP_RETR)
+        self.stop_listening()
+        self.open_tx_pipe(RadioFast.bcast)
+        self.reg_write(EN_AA, aa & ~1)  # No ACK and no retransmission
+        self.reg_write(SETUP_RETR, 0)
+        self.payload_size += 1
+        try:
+            for _ in range(repeats):
+                try:
+                    self.send(buf, timeout = self.timeout)
+                except OSError:
+                    pass
+        finally:
+            self.payload_size -= 1
+            self.reg_write(EN_AA, aa)
+            self.reg_write(SETUP_RETR, retr)
+            self.open_tx_pipe(RadioFast.pipes[0])
 
     def exchange(self, msg_send):  # Call when transmit-receive required.
         msg_rx = ToMaster()
@@ -63,15 +173,54 @@ class Master(RadioFast):
         return None  # Timeout
 
 class Slave(RadioFast):
-    def __init__(self, config):
-        super().__init__(False, config)
+    def __init__(self, config, qlen = 0):
+        super().__init__(False, config, qlen)
+        self._bcbuf = bytearray(self.payload_size + 1)
+        self._bcseq = None  # Sequence no. of last broadcast
+        self._bcnew = False  # Broadcast not yet retrieved
+        self.bcstats = [0, 0]  # Broadcasts received, duplicates discarded
+
+    def _bcrx(self):  # Read a broadcast, discarding duplicates
+        self.payload_size += 1
+        data = self.recv()
+        self.payload_size -= 1
+        self.bcstats[0] += 1
+        if data[0] == self._bcseq:
+            self.bcstats[1] += 1
+        else:
+            self._bcseq = data[0]
+            self._bcbuf[:] = data
+            self._bcnew = True
+
+    def _any_msg(self):  # Process broadcasts at head of FIFO. True if an
+        if self._ring:  # exchange message is waiting or queued.
+            self.poll()
+            return self._nq > 0
+        while self.any():
+            if self._pipe() != BCAST_PIPE:
+                return True
+            self._bcrx()
+        return False
+
+    # Return an unpacked FromMaster message if a new broadcast has arrived,
+    # otherwise None.
+    def get_broadcast(self):
+        if not self._bcok():
+            raise ValueError('Messages too long for broadcast')
+        self._any_msg()
+        if self._bcnew:
+            self._bcnew = False
+            msg_rx = FromMaster()
+            msg_rx.store(memoryview(self._bcbuf)[1:])
+            return msg_rx.unpack()
+        return None
 
     def exchange(self, msg_send, block = True):
         if block:  # Blocking read returns message on success,
-            while not self.any():  # None on timeout
+            while not self._any_msg():  # None on timeout
                 pass
         else:  # Nonblocking read returns message on success,
-            if not self.any():  # None on timeout, False on no data
+            if not self._any_msg():  # None on timeout, False on no data
                 return False
         msg_rx = FromMaster()
         if self.await_message(msg_rx):
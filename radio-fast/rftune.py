@@ -0,0 +1,138 @@
+# rftune.py Calibration of radio_fast channel and timeout.
+
+# Author: Peter Hinch
+# Copyright Peter Hinch 2020 Released under the MIT license
+
+# Modify config.py to provide master_config and slave_config for your hardware.
+# Both nodes run calibration together. Starting from the configured values the
+# master sweeps channel then timeout, retaining the best value of each. Before
+# each trial it sends the parameters to the slave in an exchange and both nodes
+# switch to them. It then performs exchanges for secs seconds, measuring their
+# rate, duration and failures. If the link fails both nodes revert to the
+# configured parameters. The message layout is defined by config.py so its
+# throughput is reported rather than swept. The recommended parameters are
+# printed in config.py format.
+
+import ustruct
+from time import ticks_ms, ticks_us, ticks_diff, sleep_ms
+from micropython import const
+import radio_fast
+from config import master_config, slave_config, FromMaster
+
+REVERT_MS = const(3000)  # Slave reverts to its config after this period of silence
+TRIES = const(20)  # Master abandons a trial if this many exchanges fail
+_FMT = '<BBBH'  # Command, trial no., channel, timeout
+_TRIAL = const(1)  # Commands
+_DATA = const(2)
+
+st = '''
+On slave issue rftune.slave()
+On master issue rftune.master()
+Optional args to master: channels=(85, 90, 95, 99), timeouts=(10, 20, 50, 100),
+secs=3, fname=None
+'''
+
+print(st)
+
+class _Msg:  # Raw message: exchange() only requires .pack()
+    def __init__(self):
+        self.buf = bytearray(FromMaster.payload_size())
+        assert len(self.buf) >= ustruct.calcsize(_FMT), 'Messages too short for rftune'
+
+    def pack(self):
+        return self.buf
+
+def _retune(radio, channel, timeout):
+    radio.set_channel(channel)
+    radio.timeout = timeout
+
+def slave(config=slave_config):
+    s = radio_fast.Slave(config)
+    base = (config.channel, s.timeout)
+    reply = _Msg()
+    tuned = False
+    t = ticks_ms()
+    while True:
+        result = s.exchange(reply, block = False)
+        if result:
+            t = ticks_ms()
+            cmd, _, channel, timeout = ustruct.unpack_from(_FMT, result.buf)
+            if cmd == _TRIAL:  # Reply has been sent: switch now
+                _retune(s, channel, timeout)
+                tuned = True
+        elif tuned and ticks_diff(ticks_ms(), t) > REVERT_MS:
+            _retune(s, *base)
+            tuned = False
+
+# Send trial parameters to the slave. On success both nodes switch to them.
+def _switch(m, msg, k, params):
+    ustruct.pack_into(_FMT, msg.buf, 0, _TRIAL, k & 0xff, *params)
+    for _ in range(TRIES):
+        if m.exchange(msg) is not None:
+            _retune(m, *params)
+            return True
+    return False
+
+# Run a trial. Return exchanges/s, us per exchange and % failed, or None if
+# the link failed.
+def _trial(m, msg, k, params, secs):
+    if not _switch(m, msg, k, params):
+        return None
+    ustruct.pack_into(_FMT, msg.buf, 0, _DATA, k & 0xff, *params)
+    ok = fail = dt = 0
+    t = ticks_ms()
+    while ticks_diff(ticks_ms(), t) < secs * 1000:
+        t0 = ticks_us()
+        if m.exchange(msg) is None:
+            fail += 1
+            if not ok and fail >= TRIES:
+                return None
+        else:
+            ok += 1
+            dt += ticks_diff(ticks_us(), t0)
+    return ok * 1000 // ticks_diff(ticks_ms(), t), dt // max(ok, 1), 100 * fail // (ok + fail)
+
+def master(config=master_config, channels=(85, 90, 95, 99), timeouts=(10, 20, 50, 100), secs=3, fname=None):
+    m = radio_fast.Master(config)
+    msg = _Msg()
+    base = (config.channel, m.timeout)
+    if config.channel not in channels:
+        channels = (config.channel,) + tuple(channels)
+    best = list(base)
+    top = None  # Best result
+    k = 0  # Trial no.
+    for idx, sweep in enumerate((channels, timeouts)):
+        current = best[idx]
+        for value in sweep:
+            best[idx] = value
+            k += 1
+            res = _trial(m, msg, k, best, secs)
+            name = 'Channel {:3d} timeout {:3d}'.format(*best)
+            if res is None:
+                print('{}  Link failed'.format(name))
+                _retune(m, *base)
+                ustruct.pack_into(_FMT, msg.buf, 0, _DATA, 0, *base)
+                sleep_ms(REVERT_MS + 1000)  # Slave reverts
+                while m.exchange(msg) is None:
+                    pass
+            else:
+                print('{}  {:4d} exchanges/s {:6d}us Failed {:2d}%'.format(name, *res))
+                if top is None or res[0] > top[0]:
+                    top = res
+                    current = value
+        best[idx] = current
+    _switch(m, msg, k + 1, base)  # Restore configured parameters
+    if top is None:
+        res = '# rftune: no trial succeeded\n'
+    else:
+        n = len(msg.buf)
+        lines = ['# Calibrated by rftune: {} exchanges/s {}us per exchange Failed {}%'.format(*top),
+                 'RadioConfig.channel = {}'.format(best[0]),
+                 'RadioConfig.timeout = {}'.format(best[1]),
+                 '# Messages of {} bytes: {} bytes/s each way'.format(n, top[0] * n)]
+        res = '\n'.join(lines) + '\n'
+    print(res)
+    if fname is not None:
+        with open(fname, 'w') as f:
+            f.write(res)
+    return res
@@ -0,0 +1,29 @@
+# rftune_sim.py Run rftune calibration using simulated radios.
+
+# Author: Peter Hinch
+# Copyright Peter Hinch 2020 Released under the MIT license
+
+# Both nodes run on one target, the slave in a thread: no hardware is needed
+# but the port must support _thread (e.g. the unix build). Copy sim_nrf.py from
+# the async directory. Packet loss may be set globally and for individual
+# channels, e.g. to check that calibration avoids a congested channel.
+
+import sim_nrf
+sim_nrf.install()  # Must precede import of radio_fast
+import _thread
+import rftune
+
+st = '''
+Issue rftune_sim.test()
+Optional args: loss=0.1, chloss={85: 0.5, 95: 1} (loss of specific channels)
+and those of rftune.master() e.g. secs=3
+'''
+
+print(st)
+
+def test(loss=0.1, chloss={85: 0.5, 95: 1}, **kwargs):
+    sim_nrf.ether.reset()
+    sim_nrf.ether.loss = loss
+    sim_nrf.ether.chloss = chloss
+    _thread.start_new_thread(rftune.slave, ())
+    return rftune.master(**kwargs)